@@ -1,21 +1,84 @@
+import functools
 import json
 import sys
 import os
 import re
-import io
 import base64
-from typing import Any, Optional, List
+from typing import Any, Dict, FrozenSet, Optional, List
 from urllib.parse import quote, unquote, urlparse, urlunparse
 
 try:
     import markdownify
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, CData, NavigableString, Tag
+    import lxml  # parser backend for BeautifulSoup(..., "lxml")
 except ImportError as e:
     print(f"Missing required dependency: {e}")
     print("Please install required packages:")
-    print("pip install markdownify beautifulsoup4")
+    print("pip install markdownify beautifulsoup4 lxml")
     sys.exit(1)
 
+# orjson (installed via requirements.txt) decodes large JSON request bodies several
+# times faster; fall back to json where it isn't installed.
+# Its JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# Element ids located by HtmlConverter._preprocess_html; attribute values are
+# matched case-insensitively, like the original regex pipeline
+_RE_CONTENT_ID = re.compile(r'^content', re.I)
+_LIKES_ID_PREFIX = 'likes-and-labels-container'
+# Tags that HtmlConverter._preprocess_html may strip; see _should_strip
+_STRIP_CANDIDATES = frozenset({'link', 'style', 'svg', 'canvas', 'script', 'div', 'img'})
+# Text of the banner span draw.io adds to diagrams in evaluation mode
+_RE_DRAWIO_EVAL = re.compile(r'draw\.io\s+evaluation\s+version', re.I)
+
+# Attributes kept on table elements by _CustomMarkdownify._sanitize_table_html
+_TABLE_ALLOWED_ATTRS = frozenset({'scope', 'colspan', 'rowspan'})
+
+# Whitespace collapse and cell separator used when cleaning markdown table rows
+_RE_WS = re.compile(r'\s+')
+_RE_CELL_SEP = re.compile(r' ?\| ?')
+
+# Line splitting and blank-line collapse used when normalizing the converted markdown in main
+_RE_NEWLINE = re.compile(r"\r?\n")
+_RE_BLANKLINES = re.compile(r"\n{3,}")
+
+
+@functools.lru_cache(maxsize=2048)
+def _normalize_href(href: str) -> Optional[str]:
+    """
+    Escape the path of a link target. Returns None for non-http or file schemes
+    and unparsable URIs. Cached, since exported pages repeat the same hrefs a lot.
+    """
+    try:
+        parsed_url = urlparse(href)
+        if parsed_url.scheme and parsed_url.scheme.lower() not in ["http", "https", "file"]:
+            return None
+        return urlunparse(parsed_url._replace(path=quote(unquote(parsed_url.path))))
+    except ValueError:  # It's not clear if this ever gets thrown
+        return None
+
+
+def _should_strip(tag: Any) -> bool:
+    """Whether preprocessing drops this element: stylesheets, diagrams, canvas/SVG, scripts and data-URI images."""
+    name = tag.name
+    if name in ('style', 'svg', 'canvas', 'script'):
+        return True
+    if name == 'link':
+        return any(rel.lower() == 'stylesheet' for rel in tag.get('rel', ()))
+    if name == 'div':
+        return (
+            tag.get('id', '').lower().startswith('drawio-macro-content')
+            or 'gediagramcontainer' in ' '.join(tag.get('class', ())).lower()
+        )
+    if name == 'img':
+        return tag.get('src', '').lower().startswith('data:')
+    return False
+
 
 class DocumentConverterResult:
     """The result of converting a document to Markdown."""
@@ -66,7 +129,7 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
     ) -> str:
         """Same as usual, but be sure to start with a new line"""
         if not convert_as_inline:
-            if not re.search(r"^\n", text):
+            if not text.startswith("\n"):
                 return "\n" + super().convert_hn(n, el, text, convert_as_inline)  # type: ignore
 
         return super().convert_hn(n, el, text, convert_as_inline)  # type: ignore
@@ -91,12 +154,8 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
 
         # Escape URIs and skip non-http or file schemes
         if href:
-            try:
-                parsed_url = urlparse(href)  # type: ignore
-                if parsed_url.scheme and parsed_url.scheme.lower() not in ["http", "https", "file"]:  # type: ignore
-                    return "%s%s%s" % (prefix, text, suffix)
-                href = urlunparse(parsed_url._replace(path=quote(unquote(parsed_url.path))))  # type: ignore
-            except ValueError:  # It's not clear if this ever gets thrown
+            href = _normalize_href(href)
+            if href is None:
                 return "%s%s%s" % (prefix, text, suffix)
 
         # For the replacement see #29: text nodes underscores are escaped
@@ -161,7 +220,7 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
         try:
             # Ensure el is a BeautifulSoup Tag
             if not hasattr(el, 'find') and isinstance(el, str):
-                el = BeautifulSoup(el, 'html.parser')
+                el = BeautifulSoup(el, 'lxml')
 
             if self.options.get("preserve_tables_as_html"):
                 return "\n\n" + self._sanitize_table_html(str(el)) + "\n\n"
@@ -178,46 +237,89 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
                 def escape_pipes(s: str) -> str:
                     return s.replace('|', r'\|')
 
-                def text_without_nested(cell):
-                    # Clone cell and remove nested tables before extracting text
-                    cell_copy = BeautifulSoup(str(cell), 'html.parser')
-                    for t in cell_copy.find_all('table'):
-                        t.decompose()
-                    return cell_copy.get_text(" ", strip=True)
+                def subtree_end(tag):
+                    # First node after tag's subtree in document order (None at the end)
+                    while tag is not None and tag.next_sibling is None:
+                        tag = tag.parent
+                    return tag.next_sibling if tag is not None else None
+
+                def split_cell(cell):
+                    # Single walk over the cell: returns the same text as
+                    # cell.get_text(" ", strip=True) minus nested tables, plus every
+                    # nested table in document order (like cell.find_all('table')).
+                    # Follows bs4's flat next_element chain, like get_text does, and
+                    # jumps straight past each nested table's subtree.
+                    parts = []
+                    nested_tables = []
+                    end = subtree_end(cell)
+                    node = cell.next_element
+                    while node is not None and node is not end:
+                        if isinstance(node, Tag):
+                            if node.name == 'table':
+                                nested_tables.append(node)
+                                nested_tables.extend(node.find_all('table'))
+                                node = subtree_end(node)
+                                continue
+                        elif type(node) in (NavigableString, CData):
+                            stripped = node.strip()
+                            if stripped:
+                                parts.append(stripped)
+                        node = node.next_element
+                    return " ".join(parts), nested_tables
 
                 def convert_nested_table_to_markdown(table_tag):
                     """Convert a nested table to markdown format"""
                     try:
-                        # Check if this nested table has further nested tables
-                        has_nested_nested = table_tag.find("table") is not None
-                        if has_nested_nested:
-                            # If nested table has its own nested tables, fall back to HTML
-                            return self._sanitize_table_html(str(table_tag))
-                        
-                        # Manual conversion to markdown table format
-                        nested_rows = []
-                        
-                        # Get all rows from the nested table
-                        thead = table_tag.find('thead')
-                        tbody = table_tag.find('tbody')
-                        
-                        if thead:
-                            for row in thead.find_all('tr', recursive=False):
-                                nested_rows.append(row)
-                        if tbody:
-                            for row in tbody.find_all('tr', recursive=False):
-                                nested_rows.append(row)
-                        if not thead and not tbody:
-                            for row in table_tag.find_all('tr', recursive=False):
-                                nested_rows.append(row)
-                        
+                        # One walk over the table collects thead/tbody, rows, cells and
+                        # cell text, bailing out as soon as a further nested table shows up
+                        thead = None
+                        tbody = None
+                        rows = []  # (row parent, cell texts) in document order
+                        row_cells = {}  # id(tr) -> that row's cell texts
+                        cell_parts = None
+                        cell_end = None
+
+                        end = subtree_end(table_tag)
+                        node = table_tag.next_element
+                        while node is not None and node is not end:
+                            if cell_parts is not None and node is cell_end:
+                                cell_parts = None
+                            if isinstance(node, Tag):
+                                name = node.name
+                                if name == 'table':
+                                    # If nested table has its own nested tables, fall back to HTML
+                                    return self._sanitize_table_html(str(table_tag))
+                                elif name == 'thead':
+                                    thead = thead or node
+                                elif name == 'tbody':
+                                    tbody = tbody or node
+                                elif name == 'tr':
+                                    cells = []
+                                    rows.append((node.parent, cells))
+                                    row_cells[id(node)] = cells
+                                elif name in ('th', 'td') and id(node.parent) in row_cells:
+                                    cell_parts = []
+                                    cell_end = subtree_end(node)
+                                    row_cells[id(node.parent)].append(cell_parts)
+                            elif cell_parts is not None and type(node) in (NavigableString, CData):
+                                stripped = node.strip()
+                                if stripped:
+                                    cell_parts.append(stripped)
+                            node = node.next_element
+
+                        # Rows directly under thead then tbody, or directly under the table
+                        if thead is not None or tbody is not None:
+                            nested_rows = [cells for parent, cells in rows if parent is thead]
+                            nested_rows += [cells for parent, cells in rows if parent is tbody]
+                        else:
+                            nested_rows = [cells for parent, cells in rows if parent is table_tag]
+
                         if not nested_rows:
                             return self._sanitize_table_html(str(table_tag))
                         
                         md_lines = []
-                        for i, row in enumerate(nested_rows):
-                            cells = row.find_all(['th', 'td'], recursive=False)
-                            cell_texts = [escape_pipes(cell.get_text(" ", strip=True)) or ' ' for cell in cells]
+                        for i, cells in enumerate(nested_rows):
+                            cell_texts = [escape_pipes(" ".join(parts)) or ' ' for parts in cells]
                             md_lines.append('| ' + ' | '.join(cell_texts) + ' |')
                             
                             # Add separator after first row (header)
@@ -230,24 +332,23 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
                         # Fall back to sanitized HTML if conversion fails
                         return self._sanitize_table_html(str(table_tag))
 
+                def child_tags(tag, names):
+                    # Direct children only (non-recursive to avoid nested tables)
+                    return [c for c in tag.children if getattr(c, 'name', None) in names]
+
                 # Row iterator (non-recursive to avoid nested)
                 def iter_rows(table_tag):
                     thead = table_tag.find('thead')
                     tbody = table_tag.find('tbody')
                     if thead:
-                        for r in thead.find_all('tr', recursive=False):
-                            yield r
+                        yield from child_tags(thead, ('tr',))
                     if tbody:
-                        for r in tbody.find_all('tr', recursive=False):
-                            yield r
+                        yield from child_tags(tbody, ('tr',))
                     if not thead and not tbody:
-                        for r in table_tag.find_all('tr', recursive=False):
-                            yield r
+                        yield from child_tags(table_tag, ('tr',))
 
-                def cells_in_row(row):
-                    return row.find_all(['th','td'], recursive=False)
-
-                rows = list(iter_rows(el))
+                # Collect each row's cells once, up front
+                rows = [child_tags(r, ('th', 'td')) for r in iter_rows(el)]
                 if not rows:
                     return ''
 
@@ -255,9 +356,9 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
                 header_cells = []
                 body_rows = []
                 if rows:
-                    first_cells = cells_in_row(rows[0])
+                    first_cells = rows[0]
                     if any(c.name == 'th' for c in first_cells):
-                        header_cells = [escape_pipes(text_without_nested(c)) or ' ' for c in first_cells]
+                        header_cells = [escape_pipes(split_cell(c)[0]) or ' ' for c in first_cells]
                         body_rows = rows[1:]
                     else:
                         # Synthetic empty header with width of first row
@@ -270,13 +371,12 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
 
                 nested_blocks: List[str] = []
 
-                for r in body_rows:
-                    cells = cells_in_row(r)
+                for cells in body_rows:
                     texts: List[str] = []
                     row_blocks: List[str] = []
                     for c in cells:
-                        base_text = escape_pipes(text_without_nested(c))
-                        nested_tables = c.find_all('table')
+                        base_text, nested_tables = split_cell(c)
+                        base_text = escape_pipes(base_text)
                         if nested_tables:
                             # Build label and blocks - convert nested tables to markdown
                             start_idx = nested_idx
@@ -320,15 +420,26 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
         if not self.options.get("sanitize_tables_html", True):
             return html
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            # Remove wrappers like <div class="table-wrap"> but keep their children
-            for wrap in soup.find_all(lambda t: t.name in ['div','span'] and any(getattr(c,'name',None)=='table' for c in t.children)):
-                wrap.unwrap()
+            soup = BeautifulSoup(html, 'lxml')
+            wrappers = []
+            seen = set()
             # Sanitize attributes on table-related elements
             for tag in soup.find_all(['table','thead','tbody','tfoot','tr','td','th','colgroup','col']):
-                allowed = {'scope','colspan','rowspan'}
-                tag.attrs = {k:v for k,v in tag.attrs.items() if k in allowed}
-            return str(soup)
+                attrs = tag.attrs
+                # Most tags are already clean; only rebuild attrs when something must go
+                if any(k not in _TABLE_ALLOWED_ATTRS for k in attrs):
+                    tag.attrs = {k:v for k,v in attrs.items() if k in _TABLE_ALLOWED_ATTRS}
+                # Wrappers like <div class="table-wrap"> are found from the table's parent
+                if tag.name == 'table':
+                    parent = tag.parent
+                    if parent is not None and parent.name in ('div', 'span') and id(parent) not in seen:
+                        seen.add(id(parent))
+                        wrappers.append(parent)
+            # Remove the wrappers but keep their children
+            for wrap in wrappers:
+                wrap.unwrap()
+            # lxml wraps fragments in <html><body>; return only the fragment itself
+            return (soup.body or soup).decode_contents()
         except Exception:
             return html
 
@@ -336,72 +447,82 @@ class _CustomMarkdownify(markdownify.MarkdownConverter):
         return super().convert_soup(soup)  # type: ignore
 
 
+# Converters hold no per-document state, so one instance is reused per option set
+_CONVERTER_CACHE: Dict[FrozenSet, _CustomMarkdownify] = {}
+
+
+def _get_converter(**options: Any) -> _CustomMarkdownify:
+    """Return a cached _CustomMarkdownify for the given options, creating it on first use."""
+    try:
+        key = frozenset(options.items())
+    except TypeError:
+        # Unhashable option values (e.g. lists) can't be cached
+        return _CustomMarkdownify(**options)
+    converter = _CONVERTER_CACHE.get(key)
+    if converter is None:
+        converter = _CONVERTER_CACHE[key] = _CustomMarkdownify(**options)
+    return converter
+
+
 class HtmlConverter:
     """HTML to Markdown converter"""
 
-    def _preprocess_html(self, html_content: str) -> str:
+    def _preprocess_html(self, soup: BeautifulSoup) -> Any:
         """
         Preprocess HTML to clean up unwanted elements and styles.
-        Mimics the Perl processing pipeline for content extraction.
+        Mimics the Perl processing pipeline for content extraction, but edits the
+        parsed tree in place instead of running regexes over the raw markup.
+        Returns the element to convert: the first content div, or the whole soup.
         """
-        # Keep from first <div id="content...>
-        content_match = re.search(r'(<div id="content[^>]*>)', html_content, re.DOTALL | re.IGNORECASE)
-        if content_match:
-            start_pos = content_match.start(1)
-            html_content = html_content[start_pos:]
-        
-        # Cut after first <div id="likes-and-labels-container">
-        likes_match = re.search(r'(<div id="likes-and-labels-container)', html_content, re.DOTALL | re.IGNORECASE)
-        if likes_match:
-            end_pos = likes_match.start(1)
-            html_content = html_content[:end_pos]
-        
-        # Remove CSS <link> tags
-        html_content = re.sub(r'<link[^>]*rel="stylesheet"[^>]*/?>', '', html_content, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-        
-        # Remove <style>...</style> blocks
-        html_content = re.sub(r'<style>.*?</style>', '', html_content, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-        
-        # Remove inline style attributes
-        html_content = re.sub(r'style="[^"]*"', '', html_content, flags=re.MULTILINE | re.IGNORECASE)
-        
-        # Remove draw.io diagram containers
-        html_content = re.sub(
-            r'<div[^>]*id="drawio-macro-content[^"]*"[^>]*>.*?</div>\s*<script[^>]*>.*?</script>',
-            '',
-            html_content,
-            flags=re.MULTILINE | re.DOTALL | re.IGNORECASE
-        )
-        
-        # Remove standalone SVG elements
-        html_content = re.sub(r'<svg[^>]*>.*?</svg>', '', html_content, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-        
-        # Remove canvas elements
-        html_content = re.sub(r'<canvas[^>]*>.*?</canvas>', '', html_content, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-        
-        # Remove script blocks related to diagrams
-        html_content = re.sub(
-            r'<script[^>]*>\s*\(function\(\)\s*\{\s*function startViewer\(\).*?</script>',
-            '',
-            html_content,
-            flags=re.MULTILINE | re.DOTALL | re.IGNORECASE
-        )
-        
-        # Remove img elements with base64 data URIs
-        html_content = re.sub(r'<img[^>]*src="data:[^"]*"[^>]*/?>\s*', '', html_content, flags=re.MULTILINE | re.IGNORECASE)
-        
-        # Remove draw.io evaluation text
-        html_content = re.sub(r'<span[^>]*>draw\.io evaluation version</span>', '', html_content, flags=re.MULTILINE | re.IGNORECASE)
-        
-        # Remove diagram-related divs by class
-        html_content = re.sub(
-            r'<div[^>]*class="[^"]*geDiagramContainer[^"]*"[^>]*>.*?</div>',
-            '',
-            html_content,
-            flags=re.MULTILINE | re.DOTALL | re.IGNORECASE
-        )
-        
-        return html_content
+        # Keep only the first <div id="content...> subtree
+        content = soup.find('div', id=_RE_CONTENT_ID)
+        root = content.extract() if content is not None else soup
+
+        # One walk over the tree: drop inline style attributes and collect the
+        # likes container, strippable tags and draw.io banner strings. bs4's
+        # find_all filters cost more per node than this plain loop
+        likes = None
+        stripped = []
+        banners = []
+        root.attrs.pop('style', None)
+        for node in root.descendants:
+            if isinstance(node, Tag):
+                attrs = node.attrs
+                attrs.pop('style', None)
+                if node.name in _STRIP_CANDIDATES and _should_strip(node):
+                    stripped.append(node)
+                elif likes is None and node.name == 'div' and attrs.get('id', '').lower().startswith(_LIKES_ID_PREFIX):
+                    likes = node
+            elif _RE_DRAWIO_EVAL.search(node):
+                banners.append(node)
+
+        # Cut everything from the first <div id="likes-and-labels-container"> onwards
+        if likes is not None:
+            node = likes
+            while node is not None and node is not root:
+                for sibling in list(node.next_siblings):
+                    sibling.extract()
+                node = node.parent
+            likes.extract()
+
+        # Remove styles, diagrams, canvas/SVG, scripts and data-URI images
+        for tag in stripped:
+            tag.extract()
+
+        # Remove the draw.io evaluation banner; looked up by its text so that
+        # ordinary (often deeply nested) spans never have their text collected
+        for text in banners:
+            span = text.find_parent('span')
+            if span is not None and ' '.join(span.get_text().split()).lower() == 'draw.io evaluation version':
+                span.extract()
+                stripped.append(span)
+
+        # Removals leave neighbouring strings split; merge them as a reparse would,
+        # so markdownify normalizes their whitespace together
+        if stripped:
+            root.smooth()
+
+        return root
 
     def convert_file(self, file_path: str, **kwargs) -> DocumentConverterResult:
         """Convert an HTML file to Markdown"""
@@ -419,29 +540,28 @@ class HtmlConverter:
         else:
             html_content = str(file_stream)
         
-        # Apply preprocessing to clean up the HTML
-        html_content = self._preprocess_html(html_content)
+        soup = BeautifulSoup(html_content, "lxml")
         
-        # Parse the preprocessed HTML
-        soup = BeautifulSoup(html_content, "html.parser")
-
-        # Remove javascript and style blocks
-        for script in soup(["script", "style"]):
-            script.extract()
+        # Apply preprocessing to clean up the HTML
+        return self._convert_preprocessed(self._preprocess_html(soup), **kwargs)
 
+    def _convert_preprocessed(self, soup: Any, **kwargs) -> DocumentConverterResult:
+        """Convert an already-preprocessed tree (see _preprocess_html) to Markdown"""
         # Print only the main content
         body_elm = soup.find("body")
         webpage_text = ""
         if body_elm:
             # Prefer preserving complex tables as HTML and appending nested tables by default
-            webpage_text = _CustomMarkdownify(
-                preserve_tables_as_html=False,
-                nested_table_handling="append",  # Use append mode to extract nested tables as markdown
-                sanitize_tables_html=True,
-                **kwargs,
-            ).convert_soup(body_elm)
+            options = {
+                "preserve_tables_as_html": False,
+                "nested_table_handling": "append",  # Use append mode to extract nested tables as markdown
+                "sanitize_tables_html": True,
+            }
+            # Caller-supplied options win over the defaults above
+            options.update(kwargs)
+            webpage_text = _get_converter(**options).convert_soup(body_elm)
         else:
-            webpage_text = _CustomMarkdownify(**kwargs).convert_soup(soup)
+            webpage_text = _get_converter(**kwargs).convert_soup(soup)
 
         assert isinstance(webpage_text, str)
 
@@ -455,13 +575,10 @@ class HtmlConverter:
 
     def convert_string(self, html_content: str, **kwargs) -> DocumentConverterResult:
         """Convert an HTML string to Markdown"""
-        # Apply preprocessing to clean up the HTML
-        html_content = self._preprocess_html(html_content)
+        # Parse once, then apply preprocessing to clean up the HTML
+        soup = BeautifulSoup(html_content, "lxml")
         
-        return self.convert_stream(
-            file_stream=io.BytesIO(html_content.encode("utf-8")),
-            **kwargs,
-        )
+        return self._convert_preprocessed(self._preprocess_html(soup), **kwargs)
 
 
 def _fix_markdown_tables(markdown_content: str) -> str:
@@ -469,51 +586,54 @@ def _fix_markdown_tables(markdown_content: str) -> str:
     Fix broken markdown tables by cleaning up cell content.
     Removes newlines and excessive whitespace within table cells.
     """
+    # No separator row means no table: skip the per-line pass entirely
+    if '|' not in markdown_content or '---' not in markdown_content:
+        return markdown_content
+    
     lines = markdown_content.split('\n')
+    line_count = len(lines)
+    
+    # Classify every line once up front; the merge loop below only reads these
+    stripped = [line.strip() for line in lines]
+    pipes = [s.count('|') for s in stripped]
+    is_row = [s.startswith('|') and s.endswith('|') for s in stripped]
+    is_sep = [p > 0 and '---' in s for s, p in zip(stripped, pipes)]
+    
     result_lines = []
     i = 0
     
-    while i < len(lines):
+    while i < line_count:
         line = lines[i]
         
-        # Check if this line looks like a table row (contains |)
-        if '|' in line and line.strip().startswith('|') and line.strip().endswith('|'):
-            # Check if next line is a separator (contains --- or similar)
-            is_header = (i + 1 < len(lines) and 
-                        '|' in lines[i + 1] and 
-                        '---' in lines[i + 1])
-            
+        # Check if this line looks like a table row (starts and ends with |)
+        if is_row[i]:
             # Process this table row and any continuation lines
             table_row = line
+            row_pipes = pipes[i]
             j = i + 1
             
             # Look ahead for lines that might be continuation of table cells
-            while j < len(lines):
-                next_line = lines[j].strip()
-                
+            while j < line_count:
                 # Stop if we hit a separator row
-                if '|' in next_line and '---' in next_line:
+                if is_sep[j]:
                     break
                 
                 # Stop if we hit another proper table row
-                if ('|' in next_line and 
-                    next_line.startswith('|') and 
-                    next_line.endswith('|') and
-                    next_line.count('|') >= table_row.count('|')):
+                if is_row[j] and pipes[j] >= row_pipes:
                     break
                 
                 # Stop if we hit an empty line or non-table content
-                if not next_line or ('|' not in next_line):
+                if not pipes[j]:
                     break
                 
-                # This looks like a continuation line - merge it
-                # Remove leading/trailing whitespace and merge with space
-                continuation_text = next_line.strip()
-                if continuation_text:
-                    # Find the last cell in the current row and append the continuation
-                    table_row = table_row.rstrip('|').rstrip() + ' ' + continuation_text
-                    if not table_row.endswith('|'):
-                        table_row += ' |'
+                # This looks like a continuation line - merge it into the last cell,
+                # keeping row_pipes equal to table_row.count('|')
+                trimmed = table_row.rstrip('|')
+                row_pipes += pipes[j] - (len(table_row) - len(trimmed))
+                table_row = trimmed.rstrip() + ' ' + stripped[j]
+                if not table_row.endswith('|'):
+                    table_row += ' |'
+                    row_pipes += 1
                 
                 j += 1
             
@@ -535,24 +655,16 @@ def _clean_table_row(row: str) -> str:
     if not row.strip() or '|' not in row:
         return row
     
-    # Split by | but preserve the structure
-    parts = row.split('|')
-    cleaned_parts = []
-    
-    for i, part in enumerate(parts):
-        if i == 0 or i == len(parts) - 1:
-            # First and last parts (before first | and after last |)
-            cleaned_parts.append(part)
-        else:
-            # Cell content - clean up whitespace and newlines
-            cleaned = part.strip()
-            # Replace multiple whitespace with single space
-            cleaned = re.sub(r'\s+', ' ', cleaned)
-            # Remove any remaining newlines
-            cleaned = cleaned.replace('\n', ' ').replace('\r', ' ')
-            cleaned_parts.append(' ' + cleaned + ' ')
+    # Text before the first | and after the last | is left untouched
+    head, _, rest = row.partition('|')
+    body, sep, tail = rest.rpartition('|')
+    if not sep:
+        return row
     
-    return '|'.join(cleaned_parts)
+    # Collapse whitespace and newlines across all cells at once, then pad every
+    # interior separator with exactly one space on each side
+    body = _RE_WS.sub(' ', body).strip()
+    return head + '| ' + _RE_CELL_SEP.sub(' | ', body) + ' |' + tail
 
 
 def main(args):
@@ -568,30 +680,20 @@ def main(args):
         # Handle different input formats
         html_content = None
         
-        # Check if we have HTTP headers and content type
-        content_type = None
-        if isinstance(args, dict) and '__ow_headers' in args:
-            headers = args.get('__ow_headers', {})
+        if isinstance(args, dict):
+            # Priority 1: Check for text/html content type with direct HTML string
+            headers = args.get('__ow_headers') or {}
             content_type = headers.get('content-type', '').lower()
-        
-        # Priority 1: Check for text/html content type with direct HTML string
-        if content_type and 'text/html' in content_type:
-            # For text/html content type, treat the raw body as HTML
-            if isinstance(args, dict) and '__ow_body' in args:
-                # Raw body from HTTP request
+            if 'text/html' in content_type:
+                # For text/html content type, treat the raw body as HTML
                 raw_body = args.get('__ow_body', '')
                 if isinstance(raw_body, str) and raw_body.strip():
                     html_content = raw_body
                 elif isinstance(raw_body, bytes):
                     html_content = raw_body.decode('utf-8')
-            elif isinstance(args, str):
-                # Direct string input
-                html_content = args
-        
-        # Priority 2: Fallback to JSON parsing if no HTML content found yet
-        if not html_content:
-            if isinstance(args, dict):
-                # Direct dictionary input
+            
+            # Priority 2: Fallback to the 'html' field if no HTML content found yet
+            if not html_content:
                 if 'html' in args:
                     html_content = args['html']
                 else:
@@ -599,22 +701,22 @@ def main(args):
                         'statusCode': 400,
                         'body': {'error': 'Missing HTML content. Provide HTML string with Content-Type: text/html or JSON with "html" field.'}
                     }
-            else:
-                # String input - assume it's JSON
-                try:
-                    data = json.loads(args) if isinstance(args, str) else args
-                    if 'html' in data:
-                        html_content = data['html']
-                    else:
-                        return {
-                            'statusCode': 400,
-                            'body': {'error': 'Missing HTML content. Provide HTML string with Content-Type: text/html or JSON with "html" field.'}
-                        }
-                except json.JSONDecodeError as e:
+        else:
+            # String input - assume it's JSON
+            try:
+                data = _json_loads(args) if isinstance(args, (str, bytes)) else args
+                if 'html' in data:
+                    html_content = data['html']
+                else:
                     return {
                         'statusCode': 400,
-                        'body': {'error': f'Invalid JSON input: {str(e)}'}
+                        'body': {'error': 'Missing HTML content. Provide HTML string with Content-Type: text/html or JSON with "html" field.'}
                     }
+            except json.JSONDecodeError as e:
+                return {
+                    'statusCode': 400,
+                    'body': {'error': f'Invalid JSON input: {str(e)}'}
+                }
         
         if not html_content:
             return {
@@ -628,9 +730,9 @@ def main(args):
         
         # Normalize the content (same as MarkItDown does)
         markdown_content = "\n".join(
-            [line.rstrip() for line in re.split(r"\r?\n", result.markdown)]
+            [line.rstrip() for line in _RE_NEWLINE.split(result.markdown)]
         )
-        markdown_content = re.sub(r"\n{3,}", "\n\n", markdown_content)
+        markdown_content = _RE_BLANKLINES.sub("\n\n", markdown_content)
         
         # Fix broken markdown tables
         markdown_content = _fix_markdown_tables(markdown_content)